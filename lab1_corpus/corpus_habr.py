@@ -1,77 +1,127 @@
 import argparse
-import hashlib
 import json
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Callable, Iterable, List, Optional
 
 import orjson
 import requests
-from bs4 import BeautifulSoup
+import xxhash
+from requests.adapters import HTTPAdapter
+from selectolax.lexbor import LexborHTMLParser
 from tqdm import tqdm
+from urllib3.util.retry import Retry
 
 
 DEFAULT_OUTPUT = "habr_corpus.jsonl"
 DEFAULT_LIMIT = 50000
 DEFAULT_DELAY = 0.5
+DEFAULT_ARTICLE_DELAY = 0.1
+DEFAULT_WORKERS = 16
+LIST_WORKERS = 8
+FLUSH_BYTES = 1 << 20
 USER_AGENT = "Mozilla/5.0 (compatible; MiniSearchBot/0.1; +https://example.com/contact)"
 
 
-def sha1_hex(value: str) -> str:
-    return hashlib.sha1(value.encode("utf-8", "ignore")).hexdigest()
+def doc_hash(value: str) -> str:
+    return xxhash.xxh3_64_hexdigest(value.encode("utf-8", "ignore"))
+
+
+class RateLimiter:
+    """Spaces calls from any number of threads at least `interval` seconds apart."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_at)
+            self._next_at = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def map_ordered(fn: Callable, items: Iterable, workers: int) -> Iterable:
+    """
+    Like ThreadPoolExecutor.map, but yields results in input order while keeping only a bounded
+    window of calls in flight, so the consumer can stop early without draining `items`.
+    """
+    ex = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(ex.submit(fn, item))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        ex.shutdown(wait=True, cancel_futures=True)
+
+
+def fetch_list_page(page: int, session: requests.Session, limiter: RateLimiter) -> List[str]:
+    limiter.wait()
+    resp = session.get(f"https://habr.com/ru/articles/page{page}/", timeout=20)
+    if resp.status_code != 200:
+        return []
+
+    urls = []
+    tree = LexborHTMLParser(resp.text)
+    for link in tree.css("a.tm-title__link"):
+        href = link.attributes.get("href")
+        if not href:
+            continue
+        urls.append(f"https://habr.com{href}" if href.startswith("/") else href)
+    return urls
 
 
 def iter_article_urls(max_pages: int, session: requests.Session, delay: float) -> Iterable[str]:
     """
     Collect article URLs from the main articles feed.
     This is a trimmed version of the multi-strategy parser from examples/IR.
+    Pages are fetched concurrently, but never more often than once per `delay` seconds overall.
     """
-    for page in range(1, max_pages + 1):
-        url = f"https://habr.com/ru/articles/page{page}/"
-        resp = session.get(url, timeout=20)
-        if resp.status_code != 200:
+    fetch = partial(fetch_list_page, session=session, limiter=RateLimiter(delay))
+    for urls in map_ordered(fetch, range(1, max_pages + 1), LIST_WORKERS):
+        if not urls:
             break
+        yield from urls
 
-        soup = BeautifulSoup(resp.text, "lxml")
-        links = soup.select("a.tm-title__link")
-        if not links:
-            break
-
-        for link in links:
-            href = link.get("href")
-            if not href:
-                continue
-            yield f"https://habr.com{href}" if href.startswith("/") else href
-
-        time.sleep(delay)
 
-
-def extract_article(url: str, session: requests.Session) -> Optional[dict]:
+def extract_article(url: str, session: requests.Session, limiter: RateLimiter) -> Optional[dict]:
+    limiter.wait()
     resp = session.get(url, timeout=20)
     if resp.status_code != 200:
         return None
 
-    soup = BeautifulSoup(resp.text, "lxml")
-    title_el = soup.find("h1")
-    body_el = soup.find("div", class_="tm-article-presenter__body")
-    if not body_el:
-        body_el = soup.find("div", class_="article-formatted-body")
+    tree = LexborHTMLParser(resp.text)
+    title_el = tree.css_first("h1")
+    body_el = tree.css_first("div.tm-article-presenter__body")
+    if body_el is None:
+        body_el = tree.css_first("div.article-formatted-body")
 
-    title = title_el.get_text(strip=True) if title_el else ""
+    title = title_el.text(strip=True) if title_el is not None else ""
 
     paragraphs = []
-    if body_el:
-        for tag in body_el.find_all(["p", "li"]):
-            text = tag.get_text(" ", strip=True)
+    if body_el is not None:
+        for tag in body_el.css("p, li"):
+            text = tag.text(separator=" ", strip=True)
             if text:
                 paragraphs.append(text)
 
     text = "\n".join(paragraphs).strip()
-    tags = [a.get_text(strip=True) for a in soup.select("a.tm-article-snippet__hubs-item-link")]
-    published_el = soup.find("time")
-    published_iso = published_el.get("datetime") if published_el else None
+    tags = [a.text(strip=True) for a in tree.css("a.tm-article-snippet__hubs-item-link")]
+    published_el = tree.css_first("time")
+    published_iso = published_el.attributes.get("datetime") if published_el is not None else None
 
-    doc_id = f"habr:{sha1_hex(url)}"
+    doc_id = f"habr:{doc_hash(url)}"
     return {
         "id": doc_id,
         "source": "habr",
@@ -86,27 +136,70 @@ def extract_article(url: str, session: requests.Session) -> Optional[dict]:
     }
 
 
-def crawl_habr(output_path: str, limit: int, max_pages: int, delay: float):
+def make_session(pool_size: int) -> requests.Session:
     session = requests.Session()
     session.headers.update({"User-Agent": USER_AGENT})
-
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        # after the last retry hand back the 429/5xx response: callers skip non-200 pages
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            raise_on_status=False,
+        ),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def iter_unique(urls: Iterable[str]) -> Iterable[str]:
     seen = set()
+    for url in urls:
+        if url in seen:
+            continue
+        seen.add(url)
+        yield url
+
+
+def iter_articles(urls: Iterable[str], session: requests.Session, workers: int, delay: float) -> Iterable[Optional[dict]]:
+    """Download articles concurrently, but never more often than once per `delay` seconds overall."""
+    fetch = partial(extract_article, session=session, limiter=RateLimiter(delay))
+    return map_ordered(fetch, urls, workers)
+
+
+def crawl_habr(
+    output_path: str,
+    limit: int,
+    max_pages: int,
+    delay: float,
+    workers: int = DEFAULT_WORKERS,
+    article_delay: float = DEFAULT_ARTICLE_DELAY,
+):
+    session = make_session(pool_size=2 * workers)
+
     written = 0
     output = Path(output_path)
     output.parent.mkdir(parents=True, exist_ok=True)
 
+    urls = iter_unique(tqdm(iter_article_urls(max_pages, session, delay), desc="collect urls"))
+    buf = bytearray()
     with output.open("wb") as out:
-        for url in tqdm(iter_article_urls(max_pages, session, delay), desc="collect urls"):
-            if url in seen:
-                continue
-            seen.add(url)
-            doc = extract_article(url, session)
-            if not doc:
-                continue
-            out.write(orjson.dumps(doc) + b"\n")
-            written += 1
-            if written >= limit:
-                break
+        try:
+            for doc in iter_articles(urls, session, workers, article_delay):
+                if not doc:
+                    continue
+                buf += orjson.dumps(doc, option=orjson.OPT_APPEND_NEWLINE)
+                if len(buf) >= FLUSH_BYTES:
+                    out.write(buf)
+                    buf.clear()
+                written += 1
+                if written >= limit:
+                    break
+        finally:
+            out.write(buf)
     return written
 
 
@@ -115,10 +208,17 @@ def main():
     parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Output JSONL path.")
     parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help="Max articles to save.")
     parser.add_argument("--pages", type=int, default=300, help="Pages to scan in the feed.")
-    parser.add_argument("--delay", type=float, default=DEFAULT_DELAY, help="Delay between list pages.")
+    parser.add_argument("--delay", type=float, default=DEFAULT_DELAY, help="Min interval between list page requests.")
+    parser.add_argument(
+        "--article-delay",
+        type=float,
+        default=DEFAULT_ARTICLE_DELAY,
+        help="Min interval between article requests across all workers (0 = no limit).",
+    )
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Parallel article downloads.")
     args = parser.parse_args()
 
-    total = crawl_habr(args.output, args.limit, args.pages, args.delay)
+    total = crawl_habr(args.output, args.limit, args.pages, args.delay, args.workers, args.article_delay)
     print(f"Saved {total} Habr articles to {args.output}")
 
 
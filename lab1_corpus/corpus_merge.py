@@ -1,44 +1,74 @@
 import argparse
-import hashlib
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, List, Set
 
 import orjson
+import xxhash
 from tqdm import tqdm
 
 
 DEFAULT_OUTPUT = "corpus.jsonl"
 DEFAULT_INPUTS: List[str] = ["habr_corpus.jsonl", "ria_corpus.jsonl"]
+FLUSH_BYTES = 1 << 20
 
 
-def sha1_hex(value: str) -> str:
-    return hashlib.sha1(value.encode("utf-8", "ignore")).hexdigest()
+READ_CHUNK = 1 << 22
+
+
+def iter_lines(path: str) -> Iterable[bytes]:
+    with open(path, "rb") as f:
+        tail = b""
+        while chunk := f.read(READ_CHUNK):
+            lines = (tail + chunk).split(b"\n")
+            tail = lines.pop()
+            yield from lines
+        if tail:
+            yield tail
 
 
 def stream_jsonl(path: str) -> Iterable[dict]:
-    with open(path, "rt", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
+    for line in iter_lines(path):
+        if not line or line.isspace():
+            continue
+        try:
             yield orjson.loads(line)
+        except orjson.JSONDecodeError:
+            # orjson rejects invalid UTF-8 on bytes input; keep the old lenient decoding for such lines
+            yield orjson.loads(line.decode("utf-8", "ignore"))
+
+
+def dedup_key(doc: dict) -> int:
+    # non-cryptographic 64-bit digests: cheap to compute and to keep in the seen set
+    url = (doc.get("url") or "").strip()
+    if url:
+        return xxhash.xxh3_64_intdigest(url.encode("utf-8"))
+    doc_id = doc.get("id")
+    if doc_id:
+        return xxhash.xxh3_64_intdigest(str(doc_id).encode("utf-8"))
+    return xxhash.xxh3_64_intdigest(orjson.dumps(doc))
 
 
 def merge(inputs: List[str], output: str):
-    seen_urls = set()
+    seen_urls: Set[int] = set()
     total = 0
     Path(output).parent.mkdir(parents=True, exist_ok=True)
 
+    buf = bytearray()
     with open(output, "wb") as out:
-        for path in inputs:
-            for doc in tqdm(stream_jsonl(path), desc=f"merge {path}"):
-                url = (doc.get("url") or "").strip()
-                dedup_key = url or doc.get("id") or sha1_hex(orjson.dumps(doc).decode("utf-8", "ignore"))
-                if dedup_key in seen_urls:
-                    continue
-                seen_urls.add(dedup_key)
-                out.write(orjson.dumps(doc) + b"\n")
-                total += 1
+        try:
+            for path in inputs:
+                for doc in tqdm(stream_jsonl(path), desc=f"merge {path}"):
+                    key = dedup_key(doc)
+                    if key in seen_urls:
+                        continue
+                    seen_urls.add(key)
+                    buf += orjson.dumps(doc, option=orjson.OPT_APPEND_NEWLINE)
+                    if len(buf) >= FLUSH_BYTES:
+                        out.write(buf)
+                        buf.clear()
+                    total += 1
+        finally:
+            out.write(buf)
     return total
 
 
@@ -1,16 +1,24 @@
 import argparse
-import hashlib
+import bz2
+import gzip
+import lzma
+import re
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable, Optional
-import xml.etree.ElementTree as ET
+from typing import BinaryIO, Iterable, Optional, Tuple
 
 import orjson
+import xxhash
+from lxml import etree
 from tqdm import tqdm
 
 
 DEFAULT_OUTPUT = "ria_corpus.jsonl"
 DEFAULT_INPUT = "ria_sitemap.xml"
+FLUSH_BYTES = 1 << 20
+
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
 
 DATE_PATTERNS = [
     "%Y-%m-%d %H:%M:%S",
@@ -19,24 +27,30 @@ DATE_PATTERNS = [
     "%Y-%m-%dT%H:%M:%S",
     "%Y-%m-%dT%H:%M",
 ]
+TZ_RE = re.compile(r"[Z+\-]")
 
 
-def sha1_hex(value: str) -> str:
-    return hashlib.sha1(value.encode("utf-8", "ignore")).hexdigest()
+def doc_hash(value: str) -> str:
+    return xxhash.xxh3_64_hexdigest(value.encode("utf-8", "ignore"))
 
 
 def strip_tz(raw: str) -> str:
     raw = raw.strip()
-    for sep in ("Z", "+", "-"):
-        if sep in raw[10:]:
-            raw = raw.split(sep, 1)[0]
-            break
+    m = TZ_RE.search(raw, 10)
+    if m:
+        raw = raw[: m.start()]
     return raw.replace("T", " ")
 
 
+@lru_cache(maxsize=4096)
 def parse_date_to_iso(raw: Optional[str]) -> Optional[str]:
     if not raw:
         return None
+    # lastmod is almost always ISO-8601, which fromisoformat handles far faster than strptime
+    try:
+        return datetime.fromisoformat(raw.strip()).replace(tzinfo=None).isoformat(timespec="seconds")
+    except ValueError:
+        pass
     clean = strip_tz(raw)
     for pat in DATE_PATTERNS:
         try:
@@ -47,28 +61,40 @@ def parse_date_to_iso(raw: Optional[str]) -> Optional[str]:
     return None
 
 
-def ensure_plain_xml(path: str):
+def open_sitemap(path: str) -> BinaryIO:
     low = path.lower()
-    if any(low.endswith(ext) for ext in (".bz2", ".gz", ".xz", ".zip")):
-        raise ValueError("Expected plain XML file, not archive: %s" % path)
+    if low.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if low.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if low.endswith(".xz"):
+        return lzma.open(path, "rb")
+    if low.endswith(".zip"):
+        raise ValueError("Zip archives are not supported, unpack first: %s" % path)
+    return open(path, "rb")
+
+
+def iter_sitemap_urls(path: str) -> Iterable[Tuple[str, Optional[str]]]:
+    """
+    Stream (loc, lastmod) pairs without building the whole tree.
+    Each <url> element is dropped as soon as it is read, so memory stays flat for huge sitemaps.
+    """
+    with open_sitemap(path) as f:
+        for _, url_el in etree.iterparse(f, events=("end",), tag=f"{SITEMAP_NS}url"):
+            loc = (url_el.findtext(f"{SITEMAP_NS}loc") or "").strip()
+            lastmod = (url_el.findtext(f"{SITEMAP_NS}lastmod") or "").strip() or None
+
+            url_el.clear()
+            while url_el.getprevious() is not None:
+                del url_el.getparent()[0]
+
+            if loc:
+                yield loc, lastmod
 
 
 def iter_ria_sitemap(path: str) -> Iterable[dict]:
-    ensure_plain_xml(path)
-    tree = ET.parse(path)
-    root = tree.getroot()
-    ns = {"sm": "http://www.sitemaps.org/schemas/sitemap/0.9"}
-
-    for url_el in root.findall("sm:url", ns):
-        loc_el = url_el.find("sm:loc", ns)
-        if loc_el is None or not (loc_el.text and loc_el.text.strip()):
-            continue
-        url = loc_el.text.strip()
-
-        lastmod_el = url_el.find("sm:lastmod", ns)
-        lastmod_raw = lastmod_el.text.strip() if lastmod_el is not None and lastmod_el.text else None
-
-        doc_id = f"ria:{sha1_hex(url)}"
+    for url, lastmod_raw in iter_sitemap_urls(path):
+        doc_id = f"ria:{doc_hash(url)}"
         yield {
             "id": doc_id,
             "source": "ria",
@@ -87,19 +113,26 @@ def iter_ria_sitemap(path: str) -> Iterable[dict]:
 
 def main():
     parser = argparse.ArgumentParser(description="RIA sitemap parser to JSONL.")
-    parser.add_argument("--input", default=DEFAULT_INPUT, help="Path to ria sitemap XML.")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="Path to ria sitemap XML (.gz/.bz2/.xz accepted).")
     parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Output JSONL path.")
     parser.add_argument("--limit", type=int, default=0, help="Optional limit for debug.")
     args = parser.parse_args()
 
     Path(args.output).parent.mkdir(parents=True, exist_ok=True)
     total = 0
+    buf = bytearray()
     with open(args.output, "wb") as out:
-        for doc in tqdm(iter_ria_sitemap(args.input), desc="parse ria sitemap"):
-            out.write(orjson.dumps(doc) + b"\n")
-            total += 1
-            if args.limit and total >= args.limit:
-                break
+        try:
+            for doc in tqdm(iter_ria_sitemap(args.input), desc="parse ria sitemap"):
+                buf += orjson.dumps(doc, option=orjson.OPT_APPEND_NEWLINE)
+                if len(buf) >= FLUSH_BYTES:
+                    out.write(buf)
+                    buf.clear()
+                total += 1
+                if args.limit and total >= args.limit:
+                    break
+        finally:
+            out.write(buf)
 
     print(f"Saved {total} RIA records to {args.output}")
 
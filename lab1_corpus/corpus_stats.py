@@ -1,7 +1,10 @@
 import argparse
+import mmap
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import List, Tuple
 
 import orjson
 from tqdm import tqdm
@@ -9,33 +12,86 @@ from tqdm import tqdm
 
 DEFAULT_INPUT = "corpus.jsonl"
 DEFAULT_REPORT = "corpus_stats.json"
+SAMPLE_SIZE = 10
 
 
-def collect_stats(path: str) -> dict:
-    if not os.path.exists(path):
-        raise FileNotFoundError(path)
-
+def chunk_bounds(path: str, parts: int) -> List[Tuple[int, int]]:
+    """Split the file into byte ranges that start and end on line boundaries."""
     file_size = os.path.getsize(path)
-    total_docs = 0
-    total_text_chars = 0
-    total_raw_bytes = 0
-    sample_raw_sizes = []
-
-    with open(path, "rb") as f:
-        for line in tqdm(f, desc=f"scan {Path(path).name}"):
+    if file_size == 0:
+        return []
+    step = max(file_size // max(parts, 1), 1)
+    bounds = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < file_size:
+            end = start + step
+            if end >= file_size:
+                end = file_size
+            else:
+                nl = mm.find(b"\n", end)
+                end = file_size if nl == -1 else nl + 1
+            bounds.append((start, end))
+            start = end
+    return bounds
+
+
+def scan_chunk(path: str, start: int, end: int) -> Tuple[int, int, int, List[int]]:
+    docs = 0
+    text_chars = 0
+    raw_bytes = 0
+    samples: List[int] = []
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = start
+        while pos < end:
+            nl = mm.find(b"\n", pos, end)
+            if nl == -1:
+                nl = end
+            line = mm[pos:nl]
+            pos = nl + 1
             if not line.strip():
                 continue
-            total_raw_bytes += len(line.rstrip(b"\r\n"))
-            if len(sample_raw_sizes) < 10:
-                sample_raw_sizes.append(len(line.rstrip(b"\r\n")))
+            size = len(line.rstrip(b"\r\n"))
+            raw_bytes += size
+            if len(samples) < SAMPLE_SIZE:
+                samples.append(size)
             try:
                 doc = orjson.loads(line)
             except orjson.JSONDecodeError:
                 continue
 
             text = doc.get("text") or ""
-            total_text_chars += len(text)
-            total_docs += 1
+            text_chars += len(text)
+            docs += 1
+    return docs, text_chars, raw_bytes, samples
+
+
+def collect_stats(path: str, workers: int = 0) -> dict:
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+
+    file_size = os.path.getsize(path)
+    workers = workers or os.cpu_count() or 1
+    bounds = chunk_bounds(path, workers)
+    total_docs = 0
+    total_text_chars = 0
+    total_raw_bytes = 0
+    sample_raw_sizes: List[int] = []
+
+    if len(bounds) <= 1:
+        results = [scan_chunk(path, start, end) for start, end in bounds]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            futures = [ex.submit(scan_chunk, path, start, end) for start, end in bounds]
+            results = [fut.result() for fut in tqdm(futures, desc=f"scan {Path(path).name}")]
+
+    # chunks are in file order, so the first samples still come from the head of the file
+    for docs, text_chars, raw_bytes, samples in results:
+        total_docs += docs
+        total_text_chars += text_chars
+        total_raw_bytes += raw_bytes
+        sample_raw_sizes.extend(samples[: SAMPLE_SIZE - len(sample_raw_sizes)])
 
     if total_docs == 0:
         return {"file": path, "error": "no_documents"}
@@ -59,9 +115,10 @@ def main():
     parser = argparse.ArgumentParser(description="Corpus size statistics.")
     parser.add_argument("--input", default=DEFAULT_INPUT, help="Input JSONL file.")
     parser.add_argument("--report", default=DEFAULT_REPORT, help="Output JSON report.")
+    parser.add_argument("--workers", type=int, default=0, help="Parallel scan processes (0 = CPU count).")
     args = parser.parse_args()
 
-    report = collect_stats(args.input)
+    report = collect_stats(args.input, args.workers)
     with open(args.report, "wb") as out:
         out.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
     print(f"Report saved to {args.report}")
@@ -1,5 +1,6 @@
 import argparse
 from pathlib import Path
+from typing import Iterable, Optional
 
 import orjson
 from tqdm import tqdm
@@ -7,29 +8,44 @@ from tqdm import tqdm
 
 DEFAULT_INPUT = "corpus.jsonl"
 DEFAULT_OUTPUT = "plain_corpus.txt"
+FLUSH_BYTES = 1 << 20
 
 
-def stream_jsonl(path: str):
+def extract_text(line: bytes) -> Optional[str]:
+    try:
+        doc = orjson.loads(line)
+    except orjson.JSONDecodeError:
+        return None
+    return doc.get("text") or ""
+
+
+def iter_texts(path: str) -> Iterable[str]:
     with open(path, "rb") as f:
         for line in f:
             if not line.strip():
                 continue
-            try:
-                yield orjson.loads(line)
-            except orjson.JSONDecodeError:
-                continue
+            text = extract_text(line)
+            if text is not None:
+                yield text
 
 
 def dump_text(input_path: str, output_path: str, limit: int = 0):
     total = 0
     Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as out:
-        for doc in tqdm(stream_jsonl(input_path), desc="export text"):
-            text = doc.get("text") or ""
-            out.write(text.replace("\r", " ").replace("\n", " ").strip() + "\n")
-            total += 1
-            if limit and total >= limit:
-                break
+    buf = bytearray()
+    with open(output_path, "wb") as out:
+        try:
+            for text in tqdm(iter_texts(input_path), desc="export text"):
+                buf += text.replace("\r", " ").replace("\n", " ").strip().encode("utf-8")
+                buf += b"\n"
+                if len(buf) >= FLUSH_BYTES:
+                    out.write(buf)
+                    buf.clear()
+                total += 1
+                if limit and total >= limit:
+                    break
+        finally:
+            out.write(buf)
     return total
 
 
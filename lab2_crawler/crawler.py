@@ -1,37 +1,59 @@
 from __future__ import annotations
 
+import asyncio
 import hashlib
 import logging
-import threading
+import signal
 import time
+import zlib
 from dataclasses import dataclass
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Set
+from urllib.parse import urljoin
 
+import httpx
 import orjson
-import requests
-from bs4 import BeautifulSoup
-from pymongo import ASCENDING
-from pymongo.collection import Collection
-from pymongo.errors import DuplicateKeyError, PyMongoError
+from bson import Binary
+from pymongo import ASCENDING, UpdateOne
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.errors import BulkWriteError, PyMongoError
+from selectolax.lexbor import LexborHTMLParser
+
+try:
+    import uvloop
+except ImportError:  # uvloop is optional (and unavailable on Windows)
+    uvloop = None
 
 from config import AppConfig, load_config
 from db import create_mongo, get_documents_collection, get_frontier_collection
 from logging_conf import setup_logging
 from robots import RobotsCache
-from url_utils import get_domain, normalize_url
+from url_utils import get_domain, normalize_and_domain, normalize_url
 
 log = logging.getLogger("crawler")
 
 
-def read_jsonl(path: str):
+READ_CHUNK = 1 << 22
+
+
+def iter_lines(path: str):
     with open(path, "rb") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                yield orjson.loads(line)
-            except orjson.JSONDecodeError:
-                continue
+        tail = b""
+        while chunk := f.read(READ_CHUNK):
+            lines = (tail + chunk).split(b"\n")
+            tail = lines.pop()
+            yield from lines
+        if tail:
+            yield tail
+
+
+def read_jsonl(path: str):
+    for line in iter_lines(path):
+        if not line or line.isspace():
+            continue
+        try:
+            yield orjson.loads(line)
+        except orjson.JSONDecodeError:
+            continue
 
 
 @dataclass
@@ -41,16 +63,21 @@ class FrontierItem:
 
 
 class SearchBot:
+    HOST_CONCURRENCY = 4
+    FLUSH_EVERY = 100
+    FLUSH_INTERVAL_SEC = 5.0
+    CLAIM_BATCH = 50
+    QUEUE_SIZE = 500
+
     def __init__(self, cfg: AppConfig):
         self.cfg = cfg
-        self.session = requests.Session()
-        self.session.headers.update({"User-Agent": cfg.logic.user_agent})
+        # the async client is bound to the running loop, so it is created in _run()
+        self.session: Optional[httpx.AsyncClient] = None
+        self.timeout = httpx.Timeout(15.0)
 
         self.db = create_mongo(cfg.db)
-        self.docs: Collection = get_documents_collection(self.db, cfg.db)
-        self.frontier: Collection = get_frontier_collection(self.db)
-
-        self._indexes_ready()
+        self.docs: AsyncCollection = get_documents_collection(self.db, cfg.db)
+        self.frontier: AsyncCollection = get_frontier_collection(self.db)
 
         self.allowed_domains = set(cfg.logic.allowed_domains)
         self.follow_links = cfg.logic.follow_links
@@ -61,44 +88,80 @@ class SearchBot:
         self.workers = cfg.logic.worker_count
 
         self.pages_done = 0
-        self._stop = threading.Event()
-        self._count_lock = threading.Lock()
-        self.robots_cache = RobotsCache(self.session, cfg.logic.user_agent)
+        self._stop = asyncio.Event()
+        self._main: Optional[asyncio.Task] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self.robots_cache: Optional[RobotsCache] = None
+        self._doc_buffer: List[UpdateOne] = []
+        self._frontier_buffer: List[UpdateOne] = []
+        self._queue: asyncio.Queue[FrontierItem] = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        # urls marked processing by this run and not yet given a _store_done
+        self._claimed: Set[str] = set()
 
     # --- helpers ---
-    def _indexes_ready(self):
-        self.docs.create_index([("url", ASCENDING)], unique=True)
-        self.docs.create_index([("source", ASCENDING)])
-        self.docs.create_index([("crawled_at", ASCENDING)])
-        self.frontier.create_index([("url", ASCENDING)], unique=True)
-        self.frontier.create_index([("status", ASCENDING), ("next_crawl_at", ASCENDING)])
-
-    def seed_frontier(self):
-        if self.frontier.estimated_document_count() > 0:
-            log.info("Frontier already has data, skip seeding")
+    async def _indexes_ready(self):
+        await self.docs.create_index([("url", ASCENDING)], unique=True)
+        await self.docs.create_index([("source", ASCENDING)])
+        await self.docs.create_index([("crawled_at", ASCENDING)])
+        await self.frontier.create_index([("url", ASCENDING)], unique=True)
+        await self.frontier.create_index([("status", ASCENDING), ("next_crawl_at", ASCENDING)])
+
+    def _host_slot(self, domain: str) -> asyncio.Semaphore:
+        slot = self._host_slots.get(domain)
+        if slot is None:
+            slot = self._host_slots[domain] = asyncio.Semaphore(self.HOST_CONCURRENCY)
+        return slot
+
+    async def _bulk(self, coll: AsyncCollection, ops: List[UpdateOne]):
+        if not ops:
             return
+        try:
+            await coll.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            log.warning("Bulk write to %s failed for %d ops: %s", coll.name, len(errors), errors[0].get("errmsg") if errors else e)
+        except PyMongoError as e:
+            log.warning("Bulk write to %s failed: %s", coll.name, e)
+
+    async def _flush(self, force: bool = False):
+        # buffers are swapped before awaiting so other workers keep appending to fresh lists
+        if self._doc_buffer and (force or len(self._doc_buffer) >= self.FLUSH_EVERY):
+            ops, self._doc_buffer = self._doc_buffer, []
+            await self._bulk(self.docs, ops)
+        if self._frontier_buffer and (force or len(self._frontier_buffer) >= self.FLUSH_EVERY):
+            ops, self._frontier_buffer = self._frontier_buffer, []
+            await self._bulk(self.frontier, ops)
+
+    async def seed_frontier(self) -> Set[str]:
+        seeded: Set[str] = set()
+        if await self.frontier.estimated_document_count() > 0:
+            log.info("Frontier already has data, skip seeding")
+            return seeded
         now = time.time()
         if self.cfg.logic.urls_jsonl:
             for doc in read_jsonl(self.cfg.logic.urls_jsonl):
                 raw_url = (doc.get("url") or "").strip()
                 if not raw_url:
                     continue
-                url = normalize_url(raw_url)
-                dom = get_domain(url)
+                url, dom = normalize_and_domain(raw_url)
                 if self.allowed_domains and dom not in self.allowed_domains:
                     continue
                 self._upsert_frontier(url, dom, now)
+                seeded.add(dom)
+                await self._flush()
         else:
             for raw in self.cfg.logic.start_urls:
-                url = normalize_url(raw)
-                dom = get_domain(url)
+                url, dom = normalize_and_domain(raw)
                 if self.allowed_domains and dom not in self.allowed_domains:
                     continue
                 self._upsert_frontier(url, dom, now)
+                seeded.add(dom)
+        await self._flush(force=True)
+        return seeded
 
     def _upsert_frontier(self, url: str, source: str, ts: float):
-        try:
-            self.frontier.update_one(
+        self._frontier_buffer.append(
+            UpdateOne(
                 {"url": url},
                 {
                     "$setOnInsert": {
@@ -111,119 +174,221 @@ class SearchBot:
                 },
                 upsert=True,
             )
-        except PyMongoError as e:
-            log.warning("Frontier upsert failed for %s: %s", url, e)
+        )
 
-    def _claim_next(self) -> Optional[FrontierItem]:
+    async def _claim_batch(self, n: int) -> List[FrontierItem]:
         now = time.time()
-        doc = self.frontier.find_one_and_update(
-            {"status": "pending", "next_crawl_at": {"$lte": now}},
+        cursor = (
+            self.frontier.find({"status": "pending", "next_crawl_at": {"$lte": now}}, {"url": 1, "source": 1})
+            .sort("discovered_at", ASCENDING)
+            .limit(n)
+        )
+        docs = await cursor.to_list(length=n)
+        if not docs:
+            return []
+        # recorded first: if update_many fails halfway, release still resets what it marked
+        self._claimed.update(d["url"] for d in docs)
+        await self.frontier.update_many(
+            {"_id": {"$in": [d["_id"] for d in docs]}},
             {"$set": {"status": "processing"}},
-            sort=[("discovered_at", ASCENDING)],
         )
-        if not doc:
-            return None
-        return FrontierItem(url=doc["url"], source=doc.get("source") or get_domain(doc["url"]))
+        return [FrontierItem(url=d["url"], source=d.get("source") or get_domain(d["url"])) for d in docs]
+
+    def _release_claimed(self):
+        # still queued or cut off mid-fetch: hand them back so the next run picks them up
+        for url in self._claimed:
+            self._frontier_buffer.append(UpdateOne({"url": url}, {"$set": {"status": "pending"}}))
+        self._claimed.clear()
 
     def _store_done(self, url: str, status: str, delay: float, error: Optional[str] = None):
         next_time = time.time() + delay
         update = {"status": status, "next_crawl_at": next_time}
         if error:
             update["last_error"] = error
-        self.frontier.update_one({"url": url}, {"$set": update})
+        self._frontier_buffer.append(UpdateOne({"url": url}, {"$set": update}))
 
     # --- crawling ---
     def run(self):
-        self.seed_frontier()
-        threads: list[threading.Thread] = []
-        for i in range(self.workers):
-            t = threading.Thread(target=self._worker, args=(i,), daemon=True)
-            t.start()
-            threads.append(t)
+        runner = uvloop.run if uvloop is not None else asyncio.run
         try:
-            while not self._stop.is_set():
-                with self._count_lock:
-                    if self.max_pages is not None and self.pages_done >= self.max_pages:
-                        self._stop.set()
-                time.sleep(0.5)
-        except KeyboardInterrupt:
-            self._stop.set()
-        for t in threads:
-            t.join()
+            runner(self._run())
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            pass
         log.info("Crawler finished, pages=%d", self.pages_done)
 
-    def _worker(self, wid: int):
+    def _on_sigint(self):
+        # first Ctrl-C: stop claiming and let in-flight pages finish; a second one aborts
+        if self._stop.is_set():
+            self._main.cancel()
+            return
+        log.info("Stopping, waiting for in-flight pages (Ctrl-C again to abort)")
+        self._stop.set()
+
+    async def _run(self):
+        self._main = asyncio.current_task()
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGINT, self._on_sigint)
+            handled = True
+        except (NotImplementedError, RuntimeError):
+            handled = False  # no loop signal handlers on Windows: Ctrl-C cancels the crawl instead
+        try:
+            await self._crawl()
+        finally:
+            if handled:
+                loop.remove_signal_handler(signal.SIGINT)
+
+    async def _crawl(self):
+        await self._indexes_ready()
+        seeded = await self.seed_frontier()
+        # HTTP/2 multiplexes many requests over one connection per host where the server supports it
+        async with httpx.AsyncClient(
+            http2=True,
+            headers={"User-Agent": self.cfg.logic.user_agent},
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60),
+            follow_redirects=True,
+        ) as session:
+            self.session = session
+            self.robots_cache = RobotsCache(session, self.cfg.logic.user_agent)
+            if self.respect_robots:
+                await self.robots_cache.seed_robots(seeded | self.allowed_domains)
+            try:
+                await asyncio.gather(
+                    self._flusher(),
+                    self._feeder(),
+                    *[self._worker(i) for i in range(self.workers)],
+                )
+            finally:
+                self._release_claimed()
+                await self._flush(force=True)
+
+    async def _pause(self, seconds: float):
+        """Sleep, but wake up as soon as the crawler is stopped."""
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _flusher(self):
+        while not self._stop.is_set():
+            await self._pause(self.FLUSH_INTERVAL_SEC)
+            await self._flush(force=True)
+
+    async def _feeder(self):
+        """Claim frontier items in batches and keep the local queue topped up."""
+        while not self._stop.is_set():
+            if self._queue.qsize() >= self.CLAIM_BATCH:
+                await self._pause(0.2)
+                continue
+            try:
+                items = await self._claim_batch(self.CLAIM_BATCH)
+            except PyMongoError as e:
+                # step-down or network blip: back off and claim again
+                log.warning("Claiming frontier items failed: %s", e)
+                await self._pause(1.0)
+                continue
+            if not items:
+                # links found so far may still sit in the write buffer; make them claimable
+                if self._frontier_buffer:
+                    await self._flush(force=True)
+                    continue
+                await self._pause(1.0)
+                continue
+            for item in items:
+                await self._queue.put(item)
+
+    async def _next_item(self) -> Optional[FrontierItem]:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout=1.0)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _worker(self, wid: int):
         while not self._stop.is_set():
-            if self.max_pages is not None:
-                with self._count_lock:
-                    if self.pages_done >= self.max_pages:
-                        break
-            item = self._claim_next()
+            item = await self._next_item()
             if not item:
-                time.sleep(1.0)
                 continue
             try:
-                self._process(item)
-                with self._count_lock:
-                    self.pages_done += 1
+                async with self._host_slot(item.source):
+                    await self._process(item)
+                self.pages_done += 1
+                if self.max_pages is not None and self.pages_done >= self.max_pages:
+                    self._stop.set()
                 self._store_done(item.url, "pending", self.revisit_after)  # back to queue for recrawl
             except Exception as e:
                 log.exception("[worker %d] error on %s: %s", wid, item.url, e)
                 self._store_done(item.url, "error", self.revisit_after, str(e))
-            time.sleep(self.delay)
+            self._claimed.discard(item.url)
+            await self._flush()
+            await self._pause(self.delay)
 
-    def _process(self, item: FrontierItem):
-        if self.respect_robots and not self.robots_cache.can_fetch(item.url):
+    async def _process(self, item: FrontierItem):
+        if self.respect_robots and not await self.robots_cache.can_fetch(item.url):
             log.info("robots.txt forbids %s", item.url)
             return
 
-        resp = self.session.get(item.url, timeout=15)
-        if resp.status_code != 200:
-            log.warning("HTTP %s for %s", resp.status_code, item.url)
-            return
-        if "text/html" not in (resp.headers.get("Content-Type") or ""):
-            log.info("skip non-html %s", item.url)
-            return
-
-        html = resp.text
-        content_hash = hashlib.sha1(html.encode("utf-8", "ignore")).hexdigest()
+        async with self.session.stream("GET", item.url) as resp:
+            if resp.status_code != 200:
+                log.warning("HTTP %s for %s", resp.status_code, item.url)
+                return
+            if "text/html" not in (resp.headers.get("Content-Type") or ""):
+                log.info("skip non-html %s", item.url)
+                return
+            await resp.aread()
+            html = resp.text
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+
+        # stored compressed (read back with zlib.decompress); hashing the compressed bytes is enough to spot changes
+        compressed = zlib.compress(html.encode("utf-8", "ignore"), 3)
+        content_hash = hashlib.sha1(compressed).hexdigest()
         crawled_at = int(time.time())
 
         norm_url = normalize_url(item.url)
-        existing = self.docs.find_one({"url": norm_url})
-        if existing and existing.get("content_hash") == content_hash:
-            self.docs.update_one({"_id": existing["_id"]}, {"$set": {"crawled_at": crawled_at}})
-        else:
-            doc = {
-                "url": norm_url,
-                "raw_html": html,
-                "source": item.source,
-                "crawled_at": crawled_at,
-                "content_hash": content_hash,
-                "etag": resp.headers.get("ETag"),
-                "last_modified": resp.headers.get("Last-Modified"),
-            }
-            try:
-                if existing:
-                    self.docs.update_one({"_id": existing["_id"]}, {"$set": doc})
-                else:
-                    self.docs.insert_one(doc)
-            except DuplicateKeyError:
-                log.warning("doc already exists: %s", norm_url)
+        doc = {
+            "url": norm_url,
+            "raw_html_gz": Binary(compressed),
+            "source": item.source,
+            "content_hash": content_hash,
+            "etag": etag,
+            "last_modified": last_modified,
+        }
+        # Changed page: rewrite the stored copy (dropping a pre-compression raw_html); an unchanged one is not touched.
+        self._doc_buffer.append(
+            UpdateOne(
+                {"url": norm_url, "content_hash": {"$ne": content_hash}},
+                {"$set": doc, "$unset": {"raw_html": ""}},
+            )
+        )
+        # New page: insert the full doc; every page gets a fresh crawled_at.
+        self._doc_buffer.append(
+            UpdateOne(
+                {"url": norm_url},
+                {"$setOnInsert": {**doc, "discovered_at": crawled_at}, "$set": {"crawled_at": crawled_at}},
+                upsert=True,
+            )
+        )
 
         if self.follow_links:
             self._enqueue_links(item.url, html)
 
     def _enqueue_links(self, base_url: str, html: str):
-        soup = BeautifulSoup(html, "html.parser")
+        tree = LexborHTMLParser(html)
         now = time.time()
-        for a in soup.find_all("a", href=True):
-            href = a["href"].strip()
-            full_url = requests.compat.urljoin(base_url, href)
-            norm = normalize_url(full_url)
-            if not norm.startswith("http"):
+        # nav/footer links repeat a lot within one page, queue each target once
+        seen_hrefs = set()
+        seen_urls = set()
+        for a in tree.css("a[href]"):
+            href = (a.attributes.get("href") or "").strip()
+            if href in seen_hrefs:
+                continue
+            seen_hrefs.add(href)
+            full_url = urljoin(base_url, href)
+            norm, dom = normalize_and_domain(full_url)
+            if not norm.startswith("http") or norm in seen_urls:
                 continue
-            dom = get_domain(norm)
+            seen_urls.add(norm)
             if self.allowed_domains and dom not in self.allowed_domains:
                 continue
             self._upsert_frontier(norm, dom, now)
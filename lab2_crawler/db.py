@@ -1,18 +1,18 @@
-from pymongo import MongoClient
-from pymongo.collection import Collection
-from pymongo.database import Database
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
 
 from config import DbConfig
 
 
-def create_mongo(db_cfg: DbConfig) -> Database:
-    client = MongoClient(db_cfg.uri)
+def create_mongo(db_cfg: DbConfig) -> AsyncDatabase:
+    client = AsyncMongoClient(db_cfg.uri)
     return client[db_cfg.database]
 
 
-def get_documents_collection(db: Database, db_cfg: DbConfig) -> Collection:
+def get_documents_collection(db: AsyncDatabase, db_cfg: DbConfig) -> AsyncCollection:
     return db[db_cfg.collection]
 
 
-def get_frontier_collection(db: Database) -> Collection:
+def get_frontier_collection(db: AsyncDatabase) -> AsyncCollection:
     return db["frontier"]
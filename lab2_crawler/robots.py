@@ -1,32 +1,64 @@
 from __future__ import annotations
 
-from typing import Dict
-from urllib.robotparser import RobotFileParser
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Iterable
 
-import requests
+import httpx
+from protego import Protego
 
 from url_utils import get_domain
 
+DISALLOW_ALL = "User-agent: *\nDisallow: /"
+
 
 class RobotsCache:
-    def __init__(self, session: requests.Session, user_agent: str):
+    PREFETCH_CONCURRENCY = 16
+    VERDICT_CACHE_SIZE = 65536
+
+    def __init__(self, session: httpx.AsyncClient, user_agent: str):
         self.session = session
         self.user_agent = user_agent
-        self._cache: Dict[str, RobotFileParser] = {}
+        # one task per domain: concurrent misses await the same fetch instead of repeating it
+        self._cache: Dict[str, asyncio.Task] = {}
+        self._verdicts: OrderedDict[str, bool] = OrderedDict()
 
-    def _load_robots(self, domain: str) -> RobotFileParser:
+    async def _load_robots(self, domain: str) -> Protego:
         robots_url = f"https://{domain}/robots.txt"
-        rp = RobotFileParser()
+        # same policy as urllib.robotparser: auth errors forbid everything, other errors allow everything
         try:
-            rp.set_url(robots_url)
-            rp.read()
+            resp = await self.session.get(robots_url, timeout=10.0)
         except Exception:
-            pass
-        return rp
-
-    def can_fetch(self, url: str) -> bool:
-        domain = get_domain(url)
-        if domain not in self._cache:
-            self._cache[domain] = self._load_robots(domain)
-        rp = self._cache[domain]
-        return rp.can_fetch(self.user_agent, url)
+            return Protego.parse(DISALLOW_ALL)
+        if resp.status_code in (401, 403):
+            return Protego.parse(DISALLOW_ALL)
+        if resp.status_code >= 400:
+            return Protego.parse("")
+        return Protego.parse(resp.text)
+
+    def _get(self, domain: str) -> asyncio.Task:
+        task = self._cache.get(domain)
+        if task is None:
+            task = self._cache[domain] = asyncio.ensure_future(self._load_robots(domain))
+        return task
+
+    async def seed_robots(self, domains: Iterable[str]):
+        slots = asyncio.Semaphore(self.PREFETCH_CONCURRENCY)
+
+        async def load(domain: str):
+            async with slots:
+                await self._get(domain)
+
+        await asyncio.gather(*[load(d) for d in sorted(set(domains))])
+
+    async def can_fetch(self, url: str) -> bool:
+        verdict = self._verdicts.get(url)
+        if verdict is not None:
+            self._verdicts.move_to_end(url)
+            return verdict
+        rp = await self._get(get_domain(url))
+        verdict = rp.can_fetch(url, self.user_agent)
+        self._verdicts[url] = verdict
+        if len(self._verdicts) > self.VERDICT_CACHE_SIZE:
+            self._verdicts.popitem(last=False)
+        return verdict
@@ -1,24 +1,36 @@
 import re
+from functools import lru_cache
+from typing import Tuple
 from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
+MULTI_SLASH_RE = re.compile(r"/+")
+URL_CACHE_SIZE = 131072
 
-def normalize_url(url: str) -> str:
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def normalize_and_domain(url: str) -> Tuple[str, str]:
+    """Normalize the URL and return it with its domain, parsing it only once."""
     url = url.strip()
     parts = urlsplit(url)
     scheme = parts.scheme.lower() or "https"
     host = parts.netloc.lower()
     if host.startswith("www."):
         host = host[4:]
-    path = re.sub(r"/+", "/", parts.path or "/")
+    path = MULTI_SLASH_RE.sub("/", parts.path or "/")
     if len(path) > 1 and path.endswith("/"):
         path = path[:-1]
     if parts.query:
         q = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
     else:
         q = ""
-    return urlunsplit((scheme, host, path, q, ""))
+    return urlunsplit((scheme, host, path, q, "")), host
+
+
+def normalize_url(url: str) -> str:
+    return normalize_and_domain(url)[0]
 
 
+@lru_cache(maxsize=URL_CACHE_SIZE)
 def get_domain(url: str) -> str:
     host = urlsplit(url).netloc.lower()
     return host[4:] if host.startswith("www.") else host
@@ -1,11 +1,14 @@
 import argparse
 import csv
-import math
 from collections import Counter
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Iterable, Tuple
 
+import matplotlib
+import numpy as np
 import orjson
+
+matplotlib.use("Agg")  # file output only, no GUI backend needed
 import matplotlib.pyplot as plt
 from tqdm import tqdm
 
@@ -14,28 +17,41 @@ DEFAULT_TOKENS = "tokens.txt"
 DEFAULT_CSV = "freq.csv"
 DEFAULT_PLOT = "zipf_plot.png"
 DEFAULT_REPORT = "token_stats.json"
-
-
-def read_tokens(path: str) -> List[str]:
-    tokens: List[str] = []
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        for line in tqdm(f, desc=f"read {Path(path).name}"):
-            token = line.strip()
-            if token:
-                tokens.append(token)
-    return tokens
-
-
-def fit_zipf(ranks: List[int], freqs: List[int], fit_top: int) -> Tuple[float, float]:
+PLOT_POINTS = 2000
+
+
+def count_tokens(path: str, batch_bytes: int = 1 << 20) -> Tuple[Counter, int, int]:
+    """
+    Stream the tokens file into a Counter without materializing the token list.
+    Returns (counter, total_tokens, total_token_chars).
+    """
+    counter: Counter = Counter()
+    update = counter.update
+    total_tokens = 0
+    total_chars = 0
+    with open(path, "r", encoding="utf-8", errors="ignore") as f, tqdm(desc=f"read {Path(path).name}") as bar:
+        while True:
+            lines = f.readlines(batch_bytes)
+            if not lines:
+                break
+            batch = [t for t in map(str.strip, lines) if t]
+            update(batch)
+            total_tokens += len(batch)
+            total_chars += sum(map(len, batch))
+            bar.update(len(lines))
+    return counter, total_tokens, total_chars
+
+
+def fit_zipf(ranks: np.ndarray, freqs: np.ndarray, fit_top: int) -> Tuple[float, float]:
     n = min(len(ranks), fit_top)
     if n < 2:
         return 1.0, 1.0
-    x = [math.log10(float(r)) for r in ranks[:n]]
-    y = [math.log10(float(f)) for f in freqs[:n]]
-    sx = sum(x)
-    sy = sum(y)
-    sxx = sum(v * v for v in x)
-    sxy = sum(a * b for a, b in zip(x, y))
+    x = np.log10(ranks[:n].astype(np.float64))
+    y = np.log10(freqs[:n].astype(np.float64))
+    sx = float(x.sum())
+    sy = float(y.sum())
+    sxx = float(np.dot(x, x))
+    sxy = float(np.dot(x, y))
     denom = n * sxx - sx * sx
     if abs(denom) < 1e-12:
         return 1.0, 1.0
@@ -43,32 +59,41 @@ def fit_zipf(ranks: List[int], freqs: List[int], fit_top: int) -> Tuple[float, f
     intercept = (sy - slope * sx) / n
     s = -slope
     K = 10 ** intercept
-    return s, K
+    return float(s), float(K)
 
 
-def export_csv(data: List[Tuple[int, str, int, float]], path: str):
+def export_csv(data: Iterable[Tuple[int, str, int, float]], path: str):
     with open(path, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
         writer.writerow(["rank", "term", "freq", "zipf_pred"])
-        for rank, term, freq, pred in data:
-            writer.writerow([rank, term, freq, f"{pred:.6f}"])
+        writer.writerows((rank, term, freq, f"{pred:.6f}") for rank, term, freq, pred in data)
+
+
+def log_spaced_indices(n: int, points: int) -> np.ndarray:
+    """Indices 0..n-1 evenly spaced on a log scale; on a log-log plot the rest would just overlap."""
+    if n <= points:
+        return np.arange(n)
+    # rint, not truncation: 10 ** log10(n) can land just below n and drop the last rank
+    return np.unique(np.rint(np.logspace(0, np.log10(n), points)).astype(np.int64)) - 1
 
 
-def plot_distribution(ranks: List[int], freqs: List[int], preds: List[float], path: str, top: int, dpi: int = 150):
+def plot_distribution(ranks: np.ndarray, freqs: np.ndarray, preds: np.ndarray, path: str, top: int, dpi: int = 150):
     top = min(top, len(ranks))
-    log_rank = [math.log10(float(r)) for r in ranks[:top]]
-    log_freq = [math.log10(float(f)) for f in freqs[:top]]
-    plt.figure(figsize=(8, 6))
+    idx = log_spaced_indices(top, PLOT_POINTS)
+    log_rank = np.log10(ranks[idx].astype(np.float64))
+    log_freq = np.log10(freqs[idx].astype(np.float64))
+    fig = plt.figure(figsize=(8, 6))
     plt.scatter(log_rank, log_freq, s=6, alpha=0.6, label="Corpus")
-    if preds:
-        log_pred = [math.log10(max(p, 1e-9)) for p in preds[:top]]
-        plt.plot(log_rank, log_pred, linewidth=2, label="Zipf fit")
+    if preds.size:
+        log_pred = np.log10(np.maximum(preds[idx], 1e-9))
+        plt.plot(log_rank, log_pred, linewidth=2, label="Zipf fit", rasterized=True)
     plt.xlabel("log10(rank)")
     plt.ylabel("log10(freq)")
     plt.title("Term frequency distribution (log-log)")
     plt.legend()
     plt.tight_layout()
     plt.savefig(path, dpi=dpi)
+    plt.close(fig)
 
 
 def main():
@@ -81,25 +106,18 @@ def main():
     ap.add_argument("--fit-top", type=int, default=50000, help="Ranks to use for Zipf fit.")
     args = ap.parse_args()
 
-    tokens = read_tokens(args.tokens)
-    total_tokens = len(tokens)
-    avg_len = sum(len(t) for t in tokens) / total_tokens if total_tokens else 0.0
+    counter, total_tokens, total_chars = count_tokens(args.tokens)
+    avg_len = total_chars / total_tokens if total_tokens else 0.0
 
-    counter = Counter(tokens)
     most_common = counter.most_common(args.top)
-    ranks = []
-    freqs = []
-    terms = []
-    for idx, (term, freq) in enumerate(most_common, start=1):
-        ranks.append(idx)
-        freqs.append(freq)
-        terms.append(term)
+    terms = [term for term, _ in most_common]
+    freqs = np.fromiter((freq for _, freq in most_common), dtype=np.int64, count=len(most_common))
+    ranks = np.arange(1, len(most_common) + 1, dtype=np.int64)
 
     s, K = fit_zipf(ranks, freqs, args.fit_top)
-    preds = [K / (r ** s) for r in ranks]
+    preds = K / np.power(ranks.astype(np.float64), s)
 
-    export_data = [(r, t, f, p) for r, t, f, p in zip(ranks, terms, freqs, preds)]
-    export_csv(export_data, args.csv)
+    export_csv(zip(ranks.tolist(), terms, freqs.tolist(), preds.tolist()), args.csv)
     plot_distribution(ranks, freqs, preds, args.plot, args.top)
 
     report = {
@@ -1,78 +1,225 @@
 import csv
-import math
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Iterable, Optional, Tuple
 
-import matplotlib.pyplot as plt
+import matplotlib
+import numpy as np
+import pandas as pd
 
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
 
-def load_termfreq(path: Path):
-    items = []
+from token_freq import PLOT_POINTS, log_spaced_indices
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # optional: without pyarrow the pandas path below is used
+    pa = None
+
+try:
+    import numba
+except ImportError:  # optional: numpy ufuncs are used instead
+    numba = None
+
+WRITE_BUFFER = 1 << 20
+# extra savefig options per output format; webp is encoded by Pillow
+SAVE_OPTS = {".webp": {"pil_kwargs": {"quality": 90}}}
+CSV_COLUMNS = ["rank", "term", "freq", "zipf_k_over_r", "log10_rank", "log10_freq", "log10_zipf"]
+
+
+READ_OPTS = dict(
+    sep="\t",
+    header=None,
+    names=["term", "cnt"],
+    engine="c",
+    na_filter=False,
+    quoting=csv.QUOTE_NONE,
+    on_bad_lines="skip",
+    encoding="utf-8",
+    encoding_errors="ignore",
+    memory_map=True,
+)
+
+
+def load_termfreq(path: Path, top: Optional[int] = None, chunk_size: int = 1_000_000):
+    """Terms and counts sorted by count descending; with top, only the first top ranks, read chunk_size lines at a time."""
+    try:
+        if top is not None:
+            return _load_termfreq_top(path, top, chunk_size)
+        df = pd.read_csv(path, dtype={"term": str, "cnt": np.int64}, **READ_OPTS)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, ValueError):
+        # malformed counts or missing columns: the line-by-line parser skips just the bad lines
+        terms, cnts = _load_termfreq_lines(path)
+    else:
+        terms = df["term"].to_numpy(dtype=object)
+        cnts = df["cnt"].to_numpy(dtype=np.int64)
+    # stable descending order, ties keep file order
+    order = np.argsort(-cnts, kind="stable")[:top]
+    return terms.take(order), cnts.take(order)
+
+
+def _load_termfreq_top(path: Path, top: int, chunk_size: int):
+    # memory stays at top + chunk_size rows however large the file is
+    terms = np.empty(0, dtype=object)
+    cnts = np.empty(0, dtype=np.int64)
+    with pd.read_csv(path, dtype={"term": str, "cnt": np.int64}, chunksize=chunk_size, **READ_OPTS) as reader:
+        for chunk in reader:
+            # current head first, so a stable sort keeps ties in file order
+            terms = np.concatenate([terms, chunk["term"].to_numpy(dtype=object)])
+            cnts = np.concatenate([cnts, chunk["cnt"].to_numpy(dtype=np.int64)])
+            order = np.argsort(-cnts, kind="stable")[:top]
+            terms, cnts = terms.take(order), cnts.take(order)
+    return terms, cnts
+
+
+def _load_termfreq_lines(path: Path):
+    terms, cnts = [], []
+    add_term, add_cnt = terms.append, cnts.append
     with path.open("r", encoding="utf-8", errors="ignore") as f:
         for line in f:
-            line = line.rstrip("\n")
-            if not line:
+            term, sep, cnt = line.partition("\t")
+            if not sep:
                 continue
             try:
-                term, cnt = line.split("\t", 1)
-                cnt = int(cnt)
-            except Exception:
+                cnt = int(cnt)  # int() ignores the trailing newline
+            except ValueError:
                 continue
-            items.append((term, cnt))
-    items.sort(key=lambda x: x[1], reverse=True)
-    return items
-
-
-def write_csv(items, out_csv: Path):
+            add_term(term)
+            add_cnt(cnt)
+    return np.array(terms, dtype=object), np.array(cnts, dtype=np.int64)
+
+
+def load_termfreq_arrow(path: Path):
+    """Same result as load_termfreq, parsed and sorted by Arrow; raises pa.ArrowInvalid on malformed input."""
+    table = pacsv.read_csv(
+        path,
+        read_options=pacsv.ReadOptions(column_names=["term", "cnt"]),
+        parse_options=pacsv.ParseOptions(delimiter="\t", quote_char=False, invalid_row_handler=lambda row: "skip"),
+        convert_options=pacsv.ConvertOptions(
+            column_types={"term": pa.string(), "cnt": pa.int64()},
+            null_values=[],  # "", NA, null... are bad counts, not missing ones
+            strings_can_be_null=False,
+        ),
+    )
+    table = table.sort_by([("cnt", "descending")])
+    return table.column("term").to_numpy(zero_copy_only=False), table.column("cnt").to_numpy()
+
+
+if numba is not None:
+
+    @numba.njit(parallel=True, cache=True)
+    def _derive_kernel(cnts, k):
+        # one fused pass instead of a temporary per numpy ufunc
+        n = cnts.size
+        zipf = np.empty(n)
+        log_r = np.empty(n)
+        log_f = np.empty(n)
+        log_z = np.empty(n)
+        log_k = np.log10(k)
+        for i in numba.prange(n):
+            r = i + 1.0
+            zipf[i] = k / r
+            log_r[i] = np.log10(r)
+            log_f[i] = np.log10(np.float64(cnts[i]))
+            log_z[i] = log_k - log_r[i]
+        return zipf, log_r, log_f, log_z
+
+
+def _derive(cnts: np.ndarray, k: int):
+    """Numeric Zipf columns (ranks, k/r, log10 rank, log10 freq, log10 k/r) for the CSV; k is the top count."""
+    ranks = np.arange(1, cnts.size + 1, dtype=np.int64)
+    if numba is not None:
+        return (ranks, *_derive_kernel(cnts, float(k)))
+    ranks_f = ranks.astype(np.float64)
+    zipf = k / ranks_f
+    log_r = np.log10(ranks_f)
+    # log10(k / r) == log10(k) - log10(r): a subtract instead of a third log pass
+    return ranks, zipf, log_r, np.log10(cnts.astype(np.float64)), np.log10(k) - log_r
+
+
+def write_csv(terms: np.ndarray, cnts: np.ndarray, derived, out_csv: Path):
     out_csv.parent.mkdir(parents=True, exist_ok=True)
-    k = items[0][1]
-    with out_csv.open("w", encoding="utf-8", newline="") as w:
-        wr = csv.writer(w)
-        wr.writerow(["rank", "term", "freq", "zipf_k_over_r", "log10_rank", "log10_freq", "log10_zipf"])
-        for i, (t, f0) in enumerate(items, start=1):
-            z = k / i
-            wr.writerow([i, t, f0, z, math.log10(i), math.log10(f0), math.log10(z)])
-
-
-def plot_zipf(items, out_png: Path):
-    ranks = list(range(1, len(items) + 1))
-    freqs = [c for _, c in items]
-    k = freqs[0] if freqs else 1
-    zipf = [k / r for r in ranks]
-
-    plt.figure(figsize=(8, 5))
+    ranks, zipf, log_r, log_f, log_z = derived
+    columns = [ranks, terms, cnts, zipf, log_r, log_f, log_z]
+    with out_csv.open("w", encoding="utf-8", newline="", buffering=WRITE_BUFFER) as w:
+        writer = csv.writer(w)
+        writer.writerow(CSV_COLUMNS)
+        # tolist() turns each column into Python scalars in one C pass; rows are zipped lazily
+        writer.writerows(zip(*(col.tolist() for col in columns)))
+
+
+def plot_zipf(cnts: np.ndarray, k: int, out_png: Path, dpi: int = 120):
+    n = cnts.size
+    idx = log_spaced_indices(n, PLOT_POINTS)
+    ranks = (idx + 1).astype(np.float64)  # only the sampled ranks, not all n
+
+    # an svg stays vector, rasterized lines there would be embedded bitmaps
+    raster = out_png.suffix.lower() != ".svg"
+    fig = plt.figure(figsize=(8, 5))
     plt.xscale("log")
     plt.yscale("log")
-    plt.plot(ranks, freqs, label="Corpus")
-    plt.plot(ranks, zipf, label="Zipf k/r")
+    plt.plot(ranks, cnts[idx], label="Corpus", rasterized=raster)
+    # k/r is a straight line on log-log axes, its endpoints are enough
+    ends = np.array([1.0, n])
+    plt.plot(ends, k / ends, label="Zipf k/r", rasterized=raster)
     plt.xlabel("Rank (log)")
     plt.ylabel("Frequency (log)")
     plt.legend()
     plt.tight_layout()
     out_png.parent.mkdir(parents=True, exist_ok=True)
-    plt.savefig(out_png, dpi=200)
+    plt.savefig(out_png, dpi=dpi, **SAVE_OPTS.get(out_png.suffix.lower(), {}))
+    plt.close(fig)
 
 
-def run(termfreq_path: str, out_csv_path: str, out_png_path: str):
+def run(termfreq_path: str, out_csv_path: str, out_png_path: str, top: Optional[int] = None):
+    """top limits the CSV and the plot to the first top ranks; the termfreq is then streamed in chunks."""
     termfreq = Path(termfreq_path)
     out_csv = Path(out_csv_path)
     out_png = Path(out_png_path)
 
-    items = load_termfreq(termfreq)
-    if not items:
+    cnts = None
+    if pa is not None and top is None:
+        try:
+            terms, cnts = load_termfreq_arrow(termfreq)
+        except pa.ArrowInvalid:
+            cnts = None  # bad counts, broken UTF-8 or empty file: let the pandas / line parser sort it out
+    if cnts is None or not cnts.size:
+        terms, cnts = load_termfreq(termfreq, top=top)
+    if not cnts.size:
         raise RuntimeError("termfreq is empty or unreadable")
 
-    write_csv(items, out_csv)
-    plot_zipf(items, out_png)
+    k = int(cnts[0])
+    # one writer for both parsers, so the CSV format does not depend on pyarrow
+    write_csv(terms, cnts, _derive(cnts, k), out_csv)
+
+    plot_zipf(cnts, k, out_png)
 
     print(f"Zipf CSV -> {out_csv}")
     print(f"Zipf plot -> {out_png}")
 
 
+def run_many(jobs: Iterable[Tuple[str, str, str]], workers: int = 0):
+    """Run several (termfreq, out_csv, out_png) jobs in parallel processes; outputs must not overlap."""
+    jobs = list(jobs)
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        for job in jobs:
+            run(*job)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        for fut in [ex.submit(run, *job) for job in jobs]:
+            fut.result()
+
+
 if __name__ == "__main__":
     import sys
 
-    if len(sys.argv) != 4:
-        print("Usage: python zipf_law.py <termfreq.tsv> <out.csv> <out.png>")
+    args = sys.argv[1:]
+    if not args or len(args) % 3:
+        print("Usage: python zipf_law.py <termfreq.tsv> <out.csv> <out.png> [<termfreq.tsv> <out.csv> <out.png> ...]")
         raise SystemExit(1)
 
-    run(sys.argv[1], sys.argv[2], sys.argv[3])
+    run_many(zip(args[0::3], args[1::3], args[2::3]))